@@ -2,9 +2,11 @@ import streamlit as st
 import google.generativeai as genai
 import json
 import datetime
-import re
+import os
 import time
 
+from third_voice import core, fastpath, prompts
+
 # --- Helper Functions ---
 
 def init_sess_state_defaults(defaults: dict):
@@ -58,92 +60,42 @@ def get_quota_info():
 
 @st.cache_resource
 def get_ai(api_key):
-    genai.configure(api_key=api_key)
-    return genai.GenerativeModel('gemini-1.5-flash')
-
-def get_offline_analysis(msg, ctx, is_received=False):
-    positive_words = ['good', 'great', 'happy', 'love', 'awesome', 'excellent', 'wonderful', 'amazing', 'perfect', 'thank']
-    negative_words = ['bad', 'hate', 'angry', 'sad', 'terrible', 'awful', 'horrible', 'upset', 'mad', 'disappointed']
-
-    msg_lower = msg.lower()
-    pos_count = sum(word in msg_lower for word in positive_words)
-    neg_count = sum(word in msg_lower for word in negative_words)
-
-    sentiment = "positive" if pos_count > neg_count else "negative" if neg_count > pos_count else "neutral"
-
-    emotion_map = {
-        'angry': ['angry', 'mad', 'furious'],
-        'sad': ['sad', 'disappointed', 'hurt'],
-        'happy': ['happy', 'excited', 'great'],
-        'anxious': ['worried', 'anxious', 'concerned']
-    }
-
-    emotion = "neutral"
-    for e, words in emotion_map.items():
-        if any(word in msg_lower for word in words):
-            emotion = e
-            break
-
-    context_insights = {
-        "romantic": "This appears to be a personal message that may involve feelings or relationship dynamics.",
-        "coparenting": "This message likely relates to child-related matters or parenting coordination.",
-        "workplace": "This seems to be a professional communication that may involve work tasks or relationships.",
-        "family": "This appears to be a family-related message that may involve personal or domestic matters.",
-        "friend": "This looks like a casual message between friends.",
-        "general": "This is a general communication."
-    }
-
-    if is_received:
-        return {
-            "sentiment": sentiment,
-            "emotion": emotion,
-            "meaning": (f"📴 **Offline Analysis:** {context_insights.get(ctx, 'This is a general communication.')} "
-                        f"The tone appears {sentiment} with {emotion} undertones. For detailed analysis, try again when API quota resets."),
-            "need": "More context needed for detailed analysis",
-            "response": (f"I understand you're sharing something important. Could you help me understand more about what you're looking "
-                         f"for in this {ctx} situation?")
-        }
+    endpoint = os.environ.get("GEMINI_API_ENDPOINT")  # e.g. a local fake provider for load tests
+    if endpoint:
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": endpoint})
     else:
-        return {
-            "sentiment": sentiment,
-            "emotion": emotion,
-            "reframed": (f"📴 **Offline Mode:** Here's a basic reframe - Consider saying: 'I'd like to discuss something regarding "
-                         f"our {ctx} situation: {msg[:80]}{'...' if len(msg) > 80 else ''}'")
-        }
+        genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-1.5-flash')
 
 def analyze(msg, ctx, is_received=False):
+    # Trivial messages are answered locally and don't count against the quota
+    local, hint = fastpath.try_local_structured(msg, is_received)
+    if local:
+        return local
+
     current_usage, remaining, daily_limit = get_quota_info()
     if remaining <= 0:
         st.warning(f"⚠️ Daily quota reached ({current_usage}/{daily_limit}). Using offline mode.")
-        return get_offline_analysis(msg, ctx, is_received)
+        return core.get_offline_analysis(msg, ctx, is_received)
 
-    prompt = (f'Context: {ctx}. Analyze this received message: "{msg}" '
-              'Return JSON with keys: sentiment, emotion, meaning, need, response') if is_received else (
-              f'Context: {ctx}. Help reframe this message: "{msg}" '
-              'Return JSON with keys: sentiment, emotion, reframed')
+    st.session_state.count += 1
+    template = core.gemini_template(msg, ctx, is_received)
+    prompt = template.render(msg, hint)
 
     ai_model = get_ai(st.session_state.api_key)
     for attempt in range(3):
         try:
+            start = time.perf_counter()
             result = ai_model.generate_content(prompt)
-            text = re.sub(r'``````', '', result.text)
-            json_match = re.search(r'\{.*\}', text, re.DOTALL)
-            cleaned_text = json_match.group(0) if json_match else text
-            parsed = json.loads(cleaned_text)
-
-            required = ['sentiment', 'emotion', 'meaning', 'need', 'response'] if is_received else ['sentiment', 'emotion', 'reframed']
-            missing_keys = [k for k in required if k not in parsed or not parsed[k]]
-            if missing_keys:
-                raise ValueError(f"Missing required keys: {missing_keys}")
-
-            return parsed
+            prompts.registry.record(template, time.perf_counter() - start, len(result.text))
+            return core.parse_gemini_response(result.text, is_received)
         except Exception as e:
             if "429" in str(e) or "quota" in str(e).lower():
                 st.error("🚫 **API Quota Exceeded**")
                 st.info("**Solutions:** Wait (reset at midnight PST), Upgrade to paid plan, or Use offline mode")
-                return get_offline_analysis(msg, ctx, is_received)
+                return core.get_offline_analysis(msg, ctx, is_received)
             if attempt == 2:
-                return get_offline_analysis(msg, ctx, is_received)
+                return core.get_offline_analysis(msg, ctx, is_received)
             time.sleep(1)
 
 def load_conversation(idx):
@@ -189,7 +141,7 @@ def render_history_sidebar():
                 st.experimental_rerun()
 
 def render_context_selector(key_suffix=""):
-    contexts = ["general", "romantic", "coparenting", "workplace", "family", "friend"]
+    contexts = list(prompts.registry.contexts)
     idx = contexts.index(st.session_state.active_ctx) if st.session_state.active_ctx in contexts else 0
     return st.selectbox("Context:", contexts, index=idx, key=f"ctx{key_suffix}")
 
@@ -205,7 +157,6 @@ def render_analysis_tab(is_received=False):
     analyze_button_label = "🔍 Analyze" if is_received else "🚀 Analyze"
     if st.button(analyze_button_label, type="primary") and msg.strip():
         with st.spinner(f"Analyzing {'the received' if is_received else 'your'} message..."):
-            state.count += 1
             result = analyze(msg, ctx, is_received)
 
             sentiment = result.get("sentiment", "neutral")
@@ -6,42 +6,21 @@ FIXES: Message box expansion, larger output, reliable buttons, proper copy text
 """
 
 import streamlit as st
-import requests
 import json
 from datetime import datetime
 import base64
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+from third_voice import core, fastpath, profiling, prompts, snapshots, threads
 
 # ===== Configuration =====
-API_URL = "https://openrouter.ai/api/v1/chat/completions"
 API_KEY = st.secrets.get("OPENROUTER_API_KEY")
 
-CONTEXTS = {
-    "general": {
-        "color": "#5D9BFF", 
-        "icon": "💙",
-        "description": "Everyday conversations and general communication"
-    },
-    "romantic": {
-        "color": "#FF7EB9", 
-        "icon": "❤️",
-        "description": "Personal relationships and intimate conversations"
-    },
-    "workplace": {
-        "color": "#6EE7B7", 
-        "icon": "💼",
-        "description": "Professional communication and work-related messages"
-    },
-    "family": {
-        "color": "#FFB347", 
-        "icon": "👨‍👩‍👧‍👦",
-        "description": "Family conversations and sensitive discussions"
-    },
-    "coparenting": {
-        "color": "#9B59B6", 
-        "icon": "👶",
-        "description": "Co-parenting communication focused on child welfare"
-    }
-}
+# Contexts (with their colors and icons) are shared with 0streamlit_app via the prompt registry
+CONTEXTS = prompts.registry.contexts
 
 # ===== Mobile-First UI Setup =====
 st.set_page_config(
@@ -183,11 +162,26 @@ def init_state():
         'selected_context': 'general',
         'message_history': [],
         'last_result': None,  # Store last AI result
-        'processing': False   # Track processing state
+        'processing': False,  # Track processing state
+        'speculative_mode': False,  # Opt-in background prefetch
+        'prefetch': None,  # Current speculative request (Prefetch)
+        'prefetch_wasted': 0,  # Speculative calls sent but never used
+        'result_cache': {},  # (message, action, context) -> result
+        'compare_mode': False,
+        'compare_contexts': ['general', 'workplace'],
+        'compare_action': None,  # Last compared action, re-rendered from cache
+        'thread_mode': False,  # Treat pasted chat logs as incremental threads
+        'thread_state': threads.new_thread_state(),
+        'pending_job': None  # {'id', 'key'} of the foreground request in flight
     }
     for key, value in defaults.items():
         if key not in st.session_state:
             st.session_state[key] = value
+    
+    # First run of this browser session: pick up where a reload left off
+    if SNAPSHOTS_ENABLED and 'session_token' not in st.session_state:
+        st.session_state.session_token = get_session_token()
+        restore_snapshot(st.session_state.session_token)
 
 def reset_actions():
     st.session_state.analyze_clicked = False
@@ -236,76 +230,403 @@ def upload_history(uploaded_file):
         return False, f"❌ Error loading file: {str(e)}"
 
 # ===== Enhanced API Functions =====
-def get_system_prompt(action, context):
-    prompts = {
-        'analyze': {
-            'general': "Analyze the emotional tone and underlying message. What might the sender really be feeling or needing? Help the user understand what's behind these words.",
-            'romantic': "Analyze this message from a romantic partner. What emotions, needs, or concerns might be underneath their words? Help the user respond with empathy.",
-            'workplace': "Analyze this professional message for hidden concerns, stress, or workplace dynamics. What might be driving this communication?",
-            'family': "Analyze this family message for underlying emotions, generational patterns, or family dynamics. What deeper feelings might be expressed?",
-            'coparenting': "Analyze this co-parenting message focusing on what emotions or concerns about the children might be underneath their words."
-        },
-        'improve': {
-            'general': "Improve this response to be more understanding, clear, and healing. Transform potential conflict into connection.",
-            'romantic': "Improve this message to be more loving, understanding, and emotionally connecting. Help heal instead of hurt.",
-            'workplace': "Improve this response to be professional, constructive, and solution-focused while acknowledging concerns.",
-            'family': "Improve this message to strengthen family bonds, show understanding, and promote healing.",
-            'coparenting': "Improve this message to be child-focused, respectful, neutral, and solution-oriented. Reduce conflict, increase cooperation."
-        }
-    }
-    return prompts[action].get(context, prompts[action]['general'])
-
 def call_api(message, action, context):
+    # Trivial messages ("ok thanks") are answered locally without spending quota
+    local, hint = fastpath.try_local(message, action)
+    if local:
+        return local, None
+    # Prompts, model choice and the request itself live in the shared core
+    return core.call_openrouter(message, action, context, API_KEY, hint=hint)
+
+# ===== Speculative Prefetch =====
+# While the user pauses between pasting and clicking, start the likely next
+# request (analysis for the selected context) in the background.
+PREFETCH_DEBOUNCE_SECONDS = 1.5  # Input must be stable this long before we call out
+PREFETCH_BUDGET = 5  # Max speculative provider calls per session that end up unused
+PREFETCH_MAX_IN_FLIGHT = 4  # Speculative provider calls at once, across all sessions
+
+class Job:
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key  # (message, action, context)
+        self.future = None
+
+class Prefetch(Job):
+    def __init__(self, key):
+        super().__init__(key)
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.sent = threading.Event()  # Set once a provider request actually went out
+        self.future = Future()
+        self.timer = None
+
+    def claim(self):
+        # Stop the debounce timer if it hasn't fired; True if the request already went out
+        with self.lock:
+            self.cancelled.set()
+            if self.timer is not None:
+                self.timer.cancel()
+            if not self.sent.is_set():
+                self.future.cancel()
+            return self.sent.is_set()
+
+@st.cache_resource
+def get_prefetch_executor():
+    # Shared by all sessions so speculation can't spawn unbounded threads
+    return ThreadPoolExecutor(max_workers=PREFETCH_MAX_IN_FLIGHT, thread_name_prefix="prefetch")
+
+@st.cache_resource
+def get_prefetch_slots():
+    # Process-wide cap on speculative provider calls in flight, across all sessions
+    return threading.BoundedSemaphore(PREFETCH_MAX_IN_FLIGHT)
+
+def _fire_prefetch(prefetch):
+    # Runs on the debounce timer's thread, so waiting out the debounce never holds a pool worker
+    message, action, context = prefetch.key
+    with prefetch.lock:
+        if prefetch.cancelled.is_set() or not prefetch.future.set_running_or_notify_cancel():
+            return
+        local, hint = fastpath.try_local(message, action)
+        if local:
+            prefetch.future.set_result((local, None))  # Answered locally: nothing spent, nothing charged
+            return
+        if not get_prefetch_slots().acquire(blocking=False):
+            prefetch.future.set_result((None, None))  # Too much speculation in flight; the click will call directly
+            return
+        prefetch.sent.set()
+    get_prefetch_executor().submit(_send_prefetch, prefetch, hint)
+
+def _send_prefetch(prefetch, hint):
     try:
-        # Available models
-        models = [
-            "google/gemma-2-9b-it:free",
-            "meta-llama/llama-3.2-3b-instruct:free",
-            "microsoft/phi-3-mini-128k-instruct:free",
-            "mistralai/mistral-7b-instruct:free"  # Original model
-        ]
-        
-        # Select model based on context (you can customize this logic)
-        if context == "workplace":
-            model = models[1]  # Use Llama for workplace
-        elif context == "romantic":
-            model = models[0]  # Use Gemma for romantic
-        else:
-            model = models[3]  # Default to Mistral
-        
-        response = requests.post(
-            API_URL,
-            headers={
-                "Authorization": f"Bearer {API_KEY}",
-                "HTTP-Referer": "https://third-voice.streamlit.app",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": get_system_prompt(action, context)},
-                    {"role": "user", "content": f"Context: {context.capitalize()}\nMessage: {message}"}
-                ],
-                "max_tokens": 1200,  # INCREASED from 800 for fuller responses
-                "temperature": 0.7
-            },
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"], None
-        else:
-            return None, f"API Error: {response.status_code}"
-            
-    except requests.exceptions.Timeout:
-        return None, "Request timed out. Please try again."
+        prefetch.future.set_result(core.call_openrouter(*prefetch.key, API_KEY, hint=hint))
     except Exception as e:
-        return None, f"Error: {str(e)}"
+        prefetch.future.set_exception(e)
+    finally:
+        get_prefetch_slots().release()
+
+def cancel_prefetch():
+    prefetch = st.session_state.prefetch
+    if prefetch is None:
+        return
+    if prefetch.claim():
+        st.session_state.prefetch_wasted += 1
+    st.session_state.prefetch = None
+
+def schedule_prefetch(message, context):
+    key = (message, "analyze", context)
+    if get_cached_result(*key):
+        # Already answered (a click used the prefetch, or compare mode fetched it): any
+        # speculation still around for it will never be taken, so it counts as wasted
+        cancel_prefetch()
+        return
+    current = st.session_state.prefetch
+    if current is not None and current.key == key:
+        return
+    cancel_prefetch()
+    if not message.strip() or st.session_state.prefetch_wasted >= PREFETCH_BUDGET:
+        return
+    prefetch = Prefetch(key)
+    # Debounce: a newer input cancels the timer before any quota is spent
+    prefetch.timer = threading.Timer(PREFETCH_DEBOUNCE_SECONDS, _fire_prefetch, args=(prefetch,))
+    prefetch.timer.daemon = True
+    track_job(prefetch)
+    prefetch.timer.start()
+    st.session_state.prefetch = prefetch
+
+def take_prefetched(message, action, context):
+    prefetch = st.session_state.prefetch
+    if prefetch is None or prefetch.key != (message, action, context):
+        return None, None
+    st.session_state.prefetch = None
+    if not prefetch.claim():
+        return None, None  # Never reached the provider (debouncing, local or capped) - call directly
+    # Waits here if the speculative request is still in flight
+    return prefetch.future.result()
+
+def get_result(message, action, context):
+    cached = get_cached_result(message, action, context)
+    if cached:
+        return cached, None
+    result, error = take_prefetched(message, action, context)
+    if not result:
+        result, error = run_job(message, action, context)
+    if result:
+        cache_result(message, action, context, result)
+    return result, error
+
+def run_job(message, action, context):
+    key = (message, action, context)
+    pending = st.session_state.pending_job
+    job = None
+    if pending and tuple(pending['key']) == key:
+        # Same request is still running from before a reload - wait on it instead of paying twice
+        job = get_job_registry().get(pending['id'])
+    if job is None:
+        # Runs inline on this script thread like any other request; only the handle is
+        # shared, so the speculative pool never delays a click
+        job = Job(key)
+        job.future = Future()
+        job.future.set_running_or_notify_cancel()
+        track_job(job)
+        st.session_state.pending_job = {'id': job.id, 'key': list(key)}
+        save_snapshot()  # Persist the handle before blocking on it
+        try:
+            job.future.set_result(call_api(*key))
+        except BaseException as e:
+            job.future.set_exception(e)  # Re-raised below; also wakes a reloaded tab waiting on it
+    try:
+        return job.future.result()
+    finally:
+        st.session_state.pending_job = None
+
+# ===== Session Snapshots =====
+# Session state is saved server-side under a token in the URL (?s=...), so a
+# refresh or evicted mobile tab doesn't lose results and re-run paid requests.
+SNAPSHOTS_ENABLED = os.environ.get("THIRD_VOICE_SNAPSHOTS", "1") != "0"
+PERSISTED_KEYS = [
+    'selected_context', 'message_history', 'last_result', 'message_input',
+    'speculative_mode', 'prefetch_wasted', 'compare_mode', 'compare_contexts',
+    'compare_action', 'thread_mode', 'thread_state', 'pending_job'
+]
+
+@st.cache_resource
+def get_snapshot_store():
+    return snapshots.open_store()
+
+@st.cache_resource
+def get_job_registry():
+    # job_id -> in-flight Job, shared by all sessions so a reloaded tab can reattach
+    return {}
+
+def get_session_token():
+    token = st.query_params.get("s")
+    if not snapshots.valid_token(token):
+        token = snapshots.new_token()
+        st.query_params["s"] = token
+    return token
+
+def track_job(job):
+    registry = get_job_registry()
+    registry[job.id] = job
+    token = st.session_state.get('session_token')
+    store = get_snapshot_store() if SNAPSHOTS_ENABLED and token else None
+    
+    def on_done(future):
+        # Runs on the worker thread: no st.* calls here
+        registry.pop(job.id, None)
+        if store is None or future.cancelled() or future.exception() is not None:
+            return
+        result, error = future.result()
+        if result:
+            store.save_job(job.id, token, result, error)
+    
+    job.future.add_done_callback(on_done)
+
+def save_snapshot():
+    if not SNAPSHOTS_ENABLED or 'session_token' not in st.session_state:
+        return
+    data = {key: st.session_state[key] for key in PERSISTED_KEYS if key in st.session_state}
+    # Newest first, so trimming an oversized snapshot drops the oldest entries
+    data['result_cache'] = [[list(key), value] for key, value in reversed(st.session_state.result_cache.items())]
+    prefetch = st.session_state.get('prefetch')
+    if prefetch is not None:
+        data['prefetch_job'] = {'id': prefetch.id, 'key': list(prefetch.key)}
+    get_snapshot_store().save(st.session_state.session_token, data)
+
+def valid_job_handle(handle):
+    # Snapshots come back from disk; anything else in these slots is ignored
+    return (isinstance(handle, dict) and isinstance(handle.get('id'), str)
+            and isinstance(handle.get('key'), list) and len(handle['key']) == 3)
+
+def restore_snapshot(token):
+    store = get_snapshot_store()
+    data = store.load(token)
+    if not data:
+        return
+    st.session_state.result_cache = {tuple(key): value for key, value in reversed(data.pop('result_cache', []))}
+    prefetch_job = data.pop('prefetch_job', None)
+    for key, value in data.items():
+        if key in PERSISTED_KEYS:
+            st.session_state[key] = value
+    
+    # Contexts come from prompts.json and may have been removed since the snapshot was taken
+    if not isinstance(st.session_state.selected_context, str) or st.session_state.selected_context not in CONTEXTS:
+        st.session_state.selected_context = 'general'
+    compare_contexts = st.session_state.compare_contexts
+    if isinstance(compare_contexts, list):
+        known = [c for c in compare_contexts if isinstance(c, str) and c in CONTEXTS]
+        st.session_state.compare_contexts = known[:COMPARE_MAX_CONTEXTS]
+    else:
+        st.session_state.compare_contexts = ['general', 'workplace']
+    thread_state = st.session_state.thread_state
+    if not isinstance(thread_state, dict) or set(thread_state) != set(threads.new_thread_state()):
+        st.session_state.thread_state = threads.new_thread_state()
+    if not valid_job_handle(st.session_state.pending_job):
+        st.session_state.pending_job = None
+    
+    # Reattach jobs that are still running; collect results of ones that finished meanwhile
+    registry = get_job_registry()
+    for handle, is_prefetch in ((st.session_state.pending_job, False), (prefetch_job, True)):
+        if not valid_job_handle(handle):
+            continue
+        job = registry.get(handle['id'])
+        if job is not None:
+            if is_prefetch:
+                st.session_state.prefetch = job
+            continue
+        finished = store.load_job(handle['id'], token)
+        if finished and finished[0]:
+            cache_result(*handle['key'], finished[0])
+    if st.session_state.pending_job and st.session_state.pending_job['id'] not in registry:
+        st.session_state.pending_job = None
+
+# ===== Per-Context Result Cache =====
+RESULT_CACHE_SIZE = 30  # Entries kept per session, oldest evicted first
+
+def get_cached_result(message, action, context):
+    return st.session_state.result_cache.get((message, action, context))
+
+def cache_result(message, action, context, result):
+    cache = st.session_state.result_cache
+    cache.pop((message, action, context), None)
+    cache[(message, action, context)] = result
+    while len(cache) > RESULT_CACHE_SIZE:
+        cache.pop(next(iter(cache)))
+
+# ===== Compare Mode =====
+COMPARE_MAX_PARALLEL = 3  # Concurrent API calls per comparison
+COMPARE_MAX_CONTEXTS = 3  # Columns stay readable on mobile
+
+def render_compare_card(placeholder, context, action, result=None, error=None, waiting=True):
+    info = CONTEXTS[context]
+    if error:
+        body = f'<span style="color: #ef4444;">❌ {error}</span>'
+    elif result:
+        body = result
+    elif waiting:
+        body = '<span style="color: #6b7280;">⏳ Waiting...</span>'
+    else:
+        body = '<span style="color: #6b7280;">Not compared yet</span>'
+    result_class = "analysis-result" if action == "analyze" else "improvement-result"
+    placeholder.markdown(f"""
+    <div class="result-container {result_class}" style="padding: 16px;">
+        <h5 style="margin-top: 0; color: {info['color']};">{info['icon']} {context.capitalize()}</h5>
+        <div style="line-height: 1.6; color: #374151; font-size: 14px;">{body}</div>
+    </div>
+    """, unsafe_allow_html=True)
+
+def run_comparison(message, action, contexts, fetch=True):
+    columns = st.columns(len(contexts))
+    placeholders = {}
+    pending = []
+    for column, context in zip(columns, contexts):
+        placeholders[context] = column.empty()
+        cached = get_cached_result(message, action, context)
+        render_compare_card(placeholders[context], context, action, result=cached, waiting=fetch)
+        if not cached:
+            pending.append(context)
+    
+    if not pending or not fetch:
+        return
+    
+    # Fan out only the contexts we have no answer for yet; render as they land
+    with ThreadPoolExecutor(max_workers=COMPARE_MAX_PARALLEL) as executor:
+        futures = {executor.submit(call_api, message, action, ctx): ctx for ctx in pending}
+        for future in as_completed(futures):
+            context = futures[future]
+            result, error = future.result()
+            render_compare_card(placeholders[context], context, action, result, error)
+            if result:
+                cache_result(message, action, context, result)
+                add_to_history(message, result, action, context)
+
+def render_compare_view(message):
+    st.multiselect(
+        "Contexts to compare:",
+        list(CONTEXTS.keys()),
+        key="compare_contexts",
+        max_selections=COMPARE_MAX_CONTEXTS,
+        format_func=lambda key: f"{CONTEXTS[key]['icon']} {key.capitalize()}"
+    )
+    contexts = st.session_state.compare_contexts
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        compare_analyze = st.button(
+            "🔍 Compare Analysis",
+            use_container_width=True,
+            disabled=not message.strip() or not contexts,
+            key="compare_analyze_btn"
+        )
+    with col2:
+        compare_improve = st.button(
+            "✨ Compare Responses",
+            use_container_width=True,
+            disabled=not message.strip() or not contexts,
+            key="compare_improve_btn"
+        )
+    
+    if compare_analyze or compare_improve:
+        st.session_state.compare_action = "analyze" if compare_analyze else "improve"
+        run_comparison(message, st.session_state.compare_action, contexts)
+    elif st.session_state.compare_action and message.strip() and contexts:
+        # Cached answers only - switching back costs no API call
+        run_comparison(message, st.session_state.compare_action, contexts, fetch=False)
+
+# ===== History Display =====
+def render_history():
+    if st.session_state.message_history:
+        with st.expander(f"📖 Recent History ({len(st.session_state.message_history)} items)", expanded=False):
+            for i, item in enumerate(st.session_state.message_history[:10]):
+                action_icon = "🔍" if item['action'] == "analyze" else "✨"
+                context_info = CONTEXTS[item['context']]
+                timestamp = datetime.fromisoformat(item['timestamp']).strftime("%m/%d %H:%M")
+                
+                st.markdown(f"""
+                <div style="border: 1px solid #e5e7eb; border-radius: 8px; padding: 12px; margin: 8px 0; background: #f9fafb;">
+                    <div style="font-size: 14px; color: #6b7280; margin-bottom: 8px;">
+                        {action_icon} {timestamp} - {context_info['icon']} {item['context'].capitalize()}
+                    </div>
+                    <div style="font-size: 13px; color: #374151; margin-bottom: 8px;">
+                        <strong>Original:</strong> {item['original'][:100]}{'...' if len(item['original']) > 100 else ''}
+                    </div>
+                    <div style="font-size: 13px; color: #374151;">
+                        <strong>Result:</strong> {item['result'][:150]}{'...' if len(item['result']) > 150 else ''}
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+
+# ===== Profiling =====
+@st.cache_resource
+def get_shared_profiler(mode):
+    # One profiler per process so timings aggregate across reruns and sessions
+    return profiling.Profiler(mode, os.environ.get("THIRD_VOICE_PROFILE_DIR", profiling.DEFAULT_DUMP_DIR))
+
+def get_profiler():
+    query = None
+    if os.environ.get("THIRD_VOICE_PROFILE_ALLOW_QUERY") == "1":
+        query = st.query_params.get("profile")  # Off by default: any visitor could turn on cProfile dumps
+    mode = profiling.parse_mode(os.environ.get("THIRD_VOICE_PROFILE"), query)
+    return get_shared_profiler(mode) if mode else None
 
 # ===== Main App =====
 def main():
+    profiler = get_profiler()
+    try:
+        if profiler is None:
+            render_app()
+            return
+        with profiler.run():
+            render_app()
+        profiling.render_panel(st, profiler, extra={"Prompt versions": prompts.registry.ab_report()})
+    finally:
+        # Also runs on st.rerun(), so every state change reaches the snapshot
+        save_snapshot()
+
+def render_app():
     init_state()
-    apply_mobile_styles()
+    with profiling.section("styles"):
+        apply_mobile_styles()
     
     # Header
     st.markdown("""
@@ -348,6 +669,25 @@ def main():
         key="message_input"
     )
     
+    # Speculative mode - start analysis while the user is still deciding
+    st.checkbox(
+        "⚡ Speculative mode",
+        key="speculative_mode",
+        help="Start analyzing in the background once you stop typing"
+    )
+    # Thread mode - pasted chat logs only send the turns we haven't seen yet
+    st.checkbox(
+        "🧵 Thread mode",
+        key="thread_mode",
+        help="Paste a whole conversation; only new replies are analyzed"
+    )
+    is_thread_input = st.session_state.thread_mode and threads.is_thread(user_input)
+    
+    if st.session_state.speculative_mode and not st.session_state.processing and not is_thread_input:
+        schedule_prefetch(user_input, st.session_state.selected_context)
+    elif not st.session_state.speculative_mode or is_thread_input:
+        cancel_prefetch()
+    
     # Character counter - REMOVED limit enforcement
     char_count = len(user_input)
     counter_class = "warning" if char_count > 5000 else ""  # Just warning, no error
@@ -398,7 +738,14 @@ def main():
         action = "analyze" if st.session_state.analyze_clicked else "improve"
         
         with st.spinner("🤔 AI is thinking..."):
-            result, error = call_api(user_input, action, st.session_state.selected_context)
+            with profiling.section("api_call"):
+                if is_thread_input:
+                    result, error, thread_stats = threads.analyze_thread(
+                        user_input, action, st.session_state.selected_context,
+                        st.session_state.thread_state, API_KEY
+                    )
+                else:
+                    result, error = get_result(user_input, action, st.session_state.selected_context)
         
         # Reset processing state
         st.session_state.processing = False
@@ -413,6 +760,12 @@ def main():
             st.session_state.last_result = result
             add_to_history(user_input, result, action, st.session_state.selected_context)
             
+            if is_thread_input:
+                if thread_stats['cached']:
+                    st.caption(f"🧵 {thread_stats['turns']} turns - no new replies, showing saved result")
+                else:
+                    st.caption(f"🧵 {thread_stats['turns']} turns - {thread_stats['new']} new analyzed, older ones summarized")
+            
             # Display result - LARGER OUTPUT BOX
             result_class = "analysis-result" if action == "analyze" else "improvement-result"
             action_icon = "🔍" if action == "analyze" else "✨"
@@ -462,6 +815,16 @@ def main():
         st.warning("⚠️ Please enter a message to analyze or improve.")
         reset_actions()
     
+    # Compare Mode - same message, several contexts side by side
+    st.checkbox(
+        "🆚 Compare contexts",
+        key="compare_mode",
+        help="See how different contexts change the advice"
+    )
+    if st.session_state.compare_mode:
+        with profiling.section("compare"):
+            render_compare_view(user_input)
+    
     # History Management Section
     st.markdown("---")
     st.markdown("### 📚 History Management")
@@ -471,7 +834,8 @@ def main():
     with hist_cols[0]:
         # Download History
         if st.session_state.message_history:
-            download_link = download_history()
+            with profiling.section("download_history"):
+                download_link = download_history()
             if download_link:
                 st.markdown(download_link, unsafe_allow_html=True)
         else:
@@ -500,26 +864,8 @@ def main():
                 st.error(message)
     
     # Show History
-    if st.session_state.message_history:
-        with st.expander(f"📖 Recent History ({len(st.session_state.message_history)} items)", expanded=False):
-            for i, item in enumerate(st.session_state.message_history[:10]):
-                action_icon = "🔍" if item['action'] == "analyze" else "✨"
-                context_info = CONTEXTS[item['context']]
-                timestamp = datetime.fromisoformat(item['timestamp']).strftime("%m/%d %H:%M")
-                
-                st.markdown(f"""
-                <div style="border: 1px solid #e5e7eb; border-radius: 8px; padding: 12px; margin: 8px 0; background: #f9fafb;">
-                    <div style="font-size: 14px; color: #6b7280; margin-bottom: 8px;">
-                        {action_icon} {timestamp} - {context_info['icon']} {item['context'].capitalize()}
-                    </div>
-                    <div style="font-size: 13px; color: #374151; margin-bottom: 8px;">
-                        <strong>Original:</strong> {item['original'][:100]}{'...' if len(item['original']) > 100 else ''}
-                    </div>
-                    <div style="font-size: 13px; color: #374151;">
-                        <strong>Result:</strong> {item['result'][:150]}{'...' if len(item['result']) > 150 else ''}
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+    with profiling.section("history_html"):
+        render_history()
     
     # Footer
     st.markdown("---")
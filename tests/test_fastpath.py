@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from third_voice import fastpath
+
+# Short hostile or alarming messages used to score as trivial because their
+# unknown words carried no weight; they must reach the model.
+NOT_TRIVIAL = [
+    "he hit me",
+    "mom died",
+    "you are so stupid",
+    "go away",
+    "thanks for the help, loser",
+    "ok bye forever",
+    "thanks, I guess",
+    "I can't keep doing this",
+    # Refusals and questions
+    "no",
+    "no.",
+    "no thanks",
+    "are you ok",
+    "is it ok",
+    "yes?",
+    "are you there",
+]
+
+TRIVIAL = [
+    "ok thanks",
+    "see you at 5",
+    "got it, thanks",
+    "thank you so much!",
+    "good morning",
+    "on my way",
+    "running 10 min late",
+]
+
+
+@pytest.mark.parametrize("message", NOT_TRIVIAL)
+def test_goes_to_model(message):
+    local, _ = fastpath.try_local(message, "analyze")
+    assert local is None
+    assert fastpath.try_local_structured(message, is_received=True)[0] is None
+
+
+@pytest.mark.parametrize("message", TRIVIAL)
+def test_answered_locally(message):
+    local, hint = fastpath.try_local(message, "analyze")
+    assert local and hint is None
+
+
+def test_unknown_words_give_a_hint():
+    local, hint = fastpath.try_local("he hit me", "analyze")
+    assert local is None and hint
+
+
+def test_trivial_examples_can_be_answered_locally():
+    data = json.loads(open(fastpath.DATA_PATH, encoding="utf-8").read())
+    data["classes"]["acknowledgement"].append("sure thing")
+    with pytest.raises(ValueError):
+        fastpath.FastPathClassifier(data)
@@ -0,0 +1,74 @@
+import copy
+
+import pytest
+
+from third_voice import prompts
+
+DATA = {
+    "contexts": {"general": {}, "workplace": {}},
+    "actions": {
+        "analyze": {
+            "active": "v1",
+            "user": "Context: {context_title}\nMessage: {message}",
+            "versions": {
+                "v1": {"general": "Read this {context} message.", "workplace": "Read this work message."},
+                "v2": {"*": "Briefly read this {context} message."}
+            }
+        }
+    },
+    "experiments": {}
+}
+
+
+def registry_with(change=None, experiments=None):
+    data = copy.deepcopy(DATA)
+    if change:
+        change(data["actions"]["analyze"])
+    return prompts.PromptRegistry(data, experiments)
+
+
+def test_bundled_registry_loads():
+    registry = prompts.load()
+    assert set(registry.contexts) >= {"general", "workplace"}
+    for action in ("analyze", "improve", "thread_analyze", "thread_improve"):
+        assert registry.get(action, "no-such-context").context == "general"
+
+
+def test_valid_registry():
+    registry = registry_with(experiments={"analyze": {"v2": 0.5}})
+    template = registry.get("analyze", "workplace", "v2")
+    assert template.system == "Briefly read this workplace message."
+    assert template.render_user("{not a field}") == "Context: Workplace\nMessage: {not a field}"
+
+
+@pytest.mark.parametrize("change", [
+    lambda spec: spec["versions"]["v1"].update(general="Read this {tone} message."),
+    lambda spec: spec.update(user="Context: {ctx}\nMessage: {message}"),
+    lambda spec: spec["versions"]["v2"].update({"*": "Read {message} carefully."}),
+    lambda spec: spec.update(user="Context: {context_title}"),
+    lambda spec: spec["versions"]["v1"].pop("workplace"),
+    lambda spec: spec["versions"]["v1"].update(family="Unknown context."),
+    lambda spec: spec.update(active="v3"),
+    lambda spec: spec["versions"]["v1"].update(general="Unbalanced {brace"),
+], ids=["unknown-system-placeholder", "unknown-user-placeholder", "message-in-system",
+        "user-without-message", "active-missing-context", "unknown-context", "undefined-active",
+        "bad-format"])
+def test_invalid_templates(change):
+    with pytest.raises(prompts.PromptRegistryError):
+        registry_with(change)
+
+
+def test_inactive_version_may_cover_some_contexts():
+    registry = registry_with(lambda spec: spec["versions"].update(v3={"general": "Only general."}))
+    assert registry.get("analyze", "workplace", "v3").version == "v1"
+
+
+@pytest.mark.parametrize("experiments", [
+    {"analyze": {"v2": -0.5, "v1": 1.0}},
+    {"analyze": {"v1": 0.6, "v2": 0.6}},
+    {"analyze": {"v9": 0.5}},
+    {"improve": {"v1": 0.5}},
+], ids=["negative", "over-one", "unknown-version", "unknown-action"])
+def test_invalid_experiments(experiments):
+    with pytest.raises(prompts.PromptRegistryError):
+        registry_with(experiments=experiments)
@@ -0,0 +1,77 @@
+import pytest
+
+from third_voice import core, threads
+
+CHAT = (
+    "12/01/2024, 10:32 - Alice: are you coming tonight?\n"
+    "12/01/2024, 10:33 - Bob: running late, sorry\n"
+    "traffic is awful\n"
+    "[10:40] Alice: fine"
+)
+
+
+def test_parse_turns():
+    turns = threads.parse_turns(CHAT)
+    assert [(turn.speaker, turn.text) for turn in turns] == [
+        ("Alice", "are you coming tonight?"),
+        ("Bob", "running late, sorry\ntraffic is awful"),
+        ("Alice", "fine"),
+    ]
+    assert threads.is_thread(CHAT)
+    assert not threads.is_thread("Alice: hi\nAlice: anyone there")
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ("They are tense.\nSUMMARY: A tense talk about plans.", ("They are tense.", "A tense talk about plans.")),
+    ("They are tense.\n\nSUMMARY:\nA tense talk.\nBob is late.", ("They are tense.", "A tense talk.\nBob is late.")),
+    ("They are tense.", ("They are tense.", None)),
+    # Headings mentioning a summary are part of the answer
+    ("**Summary of needs**:\n- Alice wants a heads-up", ("**Summary of needs**:\n- Alice wants a heads-up", None)),
+    ("SUMMARY: early line\n\nMore analysis after it.", ("SUMMARY: early line\n\nMore analysis after it.", None)),
+])
+def test_split_summary(reply, expected):
+    assert threads.split_summary(reply) == expected
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    sent = []
+
+    def fake_call(message, action, context, api_key, session=None, hint=None, template=None):
+        sent.append((message, template.action))
+        return f"Reply {len(sent)}\nSUMMARY: summary {len(sent)}", None
+
+    monkeypatch.setattr(core, "call_openrouter", fake_call)
+    return sent
+
+
+def test_only_new_turns_are_sent(provider):
+    state = threads.new_thread_state()
+    result, error, stats = threads.analyze_thread(CHAT, "analyze", "general", state, "key")
+    assert (result, error, stats['new']) == ("Reply 1", None, 3)
+    assert state['summary'] == "summary 1" and len(state['seen']) == 3
+    assert provider[0][1] == "thread_analyze"
+
+    longer = CHAT + "\nBob: be there in 5"
+    result, _, stats = threads.analyze_thread(longer, "analyze", "general", state, "key")
+    assert stats['new'] == 1
+    assert "Conversation so far (summary): summary 1" in provider[1][0]
+    assert "Alice: are you coming" not in provider[1][0]
+
+
+def test_repeat_request_is_cached(provider):
+    state = threads.new_thread_state()
+    threads.analyze_thread(CHAT, "improve", "family", state, "key")
+    result, _, stats = threads.analyze_thread(CHAT, "improve", "family", state, "key")
+    assert stats['cached'] and result == "Reply 1" and len(provider) == 1
+    assert provider[0][1] == "thread_improve"
+
+
+def test_edited_history_starts_over(provider):
+    state = threads.new_thread_state()
+    threads.analyze_thread(CHAT, "analyze", "general", state, "key")
+    edited = CHAT.replace("are you coming tonight?", "where are you?")
+    _, _, stats = threads.analyze_thread(edited, "analyze", "general", state, "key")
+    assert stats['new'] == 3
+    assert "summary 1" not in provider[1][0]
+    assert state['summary'] == "summary 2"
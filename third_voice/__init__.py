@@ -0,0 +1,4 @@
+"""
+Third Voice - shared inference core
+Prompt building and provider calls used by the Streamlit apps and the HTTP service
+"""
@@ -0,0 +1,224 @@
+"""
+Third Voice - Inference Core
+Prompts, model selection and provider calls, free of any Streamlit state
+so the apps and the HTTP service share one implementation.
+"""
+
+import json
+import os
+import re
+import time
+
+import requests
+
+from third_voice import prompts
+
+# ===== Configuration =====
+OPENROUTER_URL = os.environ.get("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+REFERER = "https://third-voice.streamlit.app"
+REQUEST_TIMEOUT = 30
+
+MODELS = [
+    "google/gemma-2-9b-it:free",
+    "meta-llama/llama-3.2-3b-instruct:free",
+    "microsoft/phi-3-mini-128k-instruct:free",
+    "mistralai/mistral-7b-instruct:free"  # Original model
+]
+
+
+class ProviderError(Exception):
+    """Raised by streaming calls, where an (result, error) tuple can't be returned."""
+
+
+# ===== Prompts =====
+def select_model(context):
+    if context == "workplace":
+        return MODELS[1]  # Use Llama for workplace
+    if context == "romantic":
+        return MODELS[0]  # Use Gemma for romantic
+    return MODELS[3]  # Default to Mistral
+
+
+def build_messages(message, action, context, hint=None, template=None):
+    # Static system prompt and user prefix come first so provider prompt caching can apply
+    template = template or prompts.registry.get(action, context)
+    return [
+        {"role": "system", "content": template.system},
+        {"role": "user", "content": template.render_user(message, hint)}
+    ]
+
+
+def build_payload(message, action, context, stream=False, hint=None, template=None):
+    payload = {
+        "model": select_model(context),
+        "messages": build_messages(message, action, context, hint, template),
+        "max_tokens": 1200,
+        "temperature": 0.7
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+
+def _headers(api_key):
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "HTTP-Referer": REFERER,
+        "Content-Type": "application/json"
+    }
+
+
+# ===== OpenRouter =====
+def call_openrouter(message, action, context, api_key, session=None, hint=None, template=None):
+    """Blocking chat completion. Returns (result, error) like the apps expect."""
+    template = template or prompts.registry.select(action, context, unit=message)
+    try:
+        start = time.perf_counter()
+        response = (session or requests).post(
+            OPENROUTER_URL,
+            headers=_headers(api_key),
+            json=build_payload(message, action, context, hint=hint, template=template),
+            timeout=REQUEST_TIMEOUT
+        )
+
+        if response.status_code == 200:
+            result = response.json()["choices"][0]["message"]["content"]
+            prompts.registry.record(template, time.perf_counter() - start, len(result))
+            return result, None
+        else:
+            return None, f"API Error: {response.status_code}"
+
+    except requests.exceptions.Timeout:
+        return None, "Request timed out. Please try again."
+    except Exception as e:
+        return None, f"Error: {str(e)}"
+
+
+def stream_openrouter(message, action, context, api_key, session=None, hint=None, template=None):
+    """Yield content deltas as they arrive. Raises ProviderError on failure."""
+    template = template or prompts.registry.select(action, context, unit=message)
+    start = time.perf_counter()
+    received = 0
+    try:
+        response = (session or requests).post(
+            OPENROUTER_URL,
+            headers=_headers(api_key),
+            json=build_payload(message, action, context, stream=True, hint=hint, template=template),
+            timeout=REQUEST_TIMEOUT,
+            stream=True
+        )
+    except requests.exceptions.Timeout:
+        raise ProviderError("Request timed out. Please try again.")
+    except Exception as e:
+        raise ProviderError(f"Error: {str(e)}")
+
+    with response:
+        if response.status_code != 200:
+            raise ProviderError(f"API Error: {response.status_code}")
+        lines = response.iter_lines(decode_unicode=True)
+        while True:
+            try:
+                line = next(lines, None)
+            except requests.exceptions.RequestException as e:
+                # Connection dropped mid-stream (e.g. ChunkedEncodingError)
+                raise ProviderError(f"Stream interrupted: {str(e)}")
+            if line is None:
+                return
+            # Server-sent events: skip keep-alive comments and blank lines
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                prompts.registry.record(template, time.perf_counter() - start, received)
+                return
+            try:
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+            except (ValueError, KeyError, IndexError):
+                continue
+            if delta:
+                received += len(delta)
+                yield delta
+
+
+# ===== Gemini (structured JSON) =====
+REQUIRED_KEYS = {
+    True: ['sentiment', 'emotion', 'meaning', 'need', 'response'],
+    False: ['sentiment', 'emotion', 'reframed']
+}
+
+
+def gemini_template(msg, ctx, is_received=False):
+    """Registry template for the Gemini app; render with template.render(msg, hint)."""
+    return prompts.registry.select("translate" if is_received else "coach", ctx, unit=msg)
+
+
+def parse_gemini_response(text, is_received=False):
+    """Pull the JSON object out of a model reply. Raises ValueError if unusable."""
+    text = re.sub(r'``````', '', text)
+    json_match = re.search(r'\{.*\}', text, re.DOTALL)
+    cleaned_text = json_match.group(0) if json_match else text
+    parsed = json.loads(cleaned_text)
+
+    missing_keys = [k for k in REQUIRED_KEYS[is_received] if k not in parsed or not parsed[k]]
+    if missing_keys:
+        raise ValueError(f"Missing required keys: {missing_keys}")
+    return parsed
+
+
+# ===== Offline Fallback =====
+POSITIVE_WORDS = ['good', 'great', 'happy', 'love', 'awesome', 'excellent', 'wonderful', 'amazing', 'perfect', 'thank']
+NEGATIVE_WORDS = ['bad', 'hate', 'angry', 'sad', 'terrible', 'awful', 'horrible', 'upset', 'mad', 'disappointed']
+
+EMOTION_MAP = {
+    'angry': ['angry', 'mad', 'furious'],
+    'sad': ['sad', 'disappointed', 'hurt'],
+    'happy': ['happy', 'excited', 'great'],
+    'anxious': ['worried', 'anxious', 'concerned']
+}
+
+CONTEXT_INSIGHTS = {
+    "romantic": "This appears to be a personal message that may involve feelings or relationship dynamics.",
+    "coparenting": "This message likely relates to child-related matters or parenting coordination.",
+    "workplace": "This seems to be a professional communication that may involve work tasks or relationships.",
+    "family": "This appears to be a family-related message that may involve personal or domestic matters.",
+    "friend": "This looks like a casual message between friends.",
+    "general": "This is a general communication."
+}
+
+
+def score_sentiment(msg):
+    """Keyword sentiment and emotion; returns (sentiment, emotion)."""
+    msg_lower = msg.lower()
+    pos_count = sum(word in msg_lower for word in POSITIVE_WORDS)
+    neg_count = sum(word in msg_lower for word in NEGATIVE_WORDS)
+
+    sentiment = "positive" if pos_count > neg_count else "negative" if neg_count > pos_count else "neutral"
+
+    emotion = "neutral"
+    for e, words in EMOTION_MAP.items():
+        if any(word in msg_lower for word in words):
+            emotion = e
+            break
+    return sentiment, emotion
+
+
+def get_offline_analysis(msg, ctx, is_received=False):
+    sentiment, emotion = score_sentiment(msg)
+
+    if is_received:
+        return {
+            "sentiment": sentiment,
+            "emotion": emotion,
+            "meaning": (f"📴 **Offline Analysis:** {CONTEXT_INSIGHTS.get(ctx, 'This is a general communication.')} "
+                        f"The tone appears {sentiment} with {emotion} undertones. For detailed analysis, try again when API quota resets."),
+            "need": "More context needed for detailed analysis",
+            "response": (f"I understand you're sharing something important. Could you help me understand more about what you're looking "
+                         f"for in this {ctx} situation?")
+        }
+    else:
+        return {
+            "sentiment": sentiment,
+            "emotion": emotion,
+            "reframed": (f"📴 **Offline Mode:** Here's a basic reframe - Consider saying: 'I'd like to discuss something regarding "
+                         f"our {ctx} situation: {msg[:80]}{'...' if len(msg) > 80 else ''}'")
+        }
@@ -0,0 +1,161 @@
+"""
+Third Voice - Local Fast Path
+A tiny naive Bayes classifier, trained at import from the bundled
+data/fastpath.json, that spots trivial messages ("ok thanks", "see you at 5")
+in microseconds. Confident trivial messages made of words the classifier
+has seen get a local answer; borderline ones go to the model with the local
+read attached as a hint.
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+
+from third_voice import core
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "fastpath.json")
+
+TRIVIAL_CONFIDENCE = 0.85  # At or above (and not risky): answer locally; below: borderline
+KNOWN_RATIO = 0.85  # Share of words seen in training needed to trust a trivial label
+SUBSTANTIVE = "substantive"
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _features(tokens):
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+
+class Verdict:
+    def __init__(self, label, confidence, sentiment, emotion, risky, known=1.0):
+        self.label = label
+        self.confidence = confidence
+        self.sentiment = sentiment
+        self.emotion = emotion
+        self.risky = risky
+        self.known = known  # Fraction of words in the training vocabulary
+
+    @property
+    def trivial(self):
+        # Unknown words carry no evidence either way, so "he hit me" can score as
+        # gratitude; only a mostly-known message is trusted with a local answer
+        return (self.label != SUBSTANTIVE and self.confidence >= TRIVIAL_CONFIDENCE
+                and self.known >= KNOWN_RATIO and not self.risky and self.sentiment != "negative")
+
+    @property
+    def hint(self):
+        """Local read for borderline messages, None when the model needs no help."""
+        if self.trivial or self.label == SUBSTANTIVE and self.confidence >= TRIVIAL_CONFIDENCE:
+            return None
+        return (f"sentiment={self.sentiment}, emotion={self.emotion}, "
+                f"looks like {self.label} ({self.confidence:.0%} confidence)")
+
+
+class FastPathClassifier:
+    def __init__(self, data):
+        self.risk_terms = frozenset(data["risk_terms"])
+        self.question_words = frozenset(data["question_words"])
+        self.max_tokens = data["max_tokens"]
+        self.replies = data["replies"]
+        self.labels = list(data["classes"])
+
+        counts = {label: Counter() for label in self.labels}
+        self.words = set()
+        for label, examples in data["classes"].items():
+            for example in examples:
+                tokens = tokenize(example)
+                if label != SUBSTANTIVE and self._risky(example, tokens):
+                    # Such an example could never be answered locally; fix the data instead
+                    raise ValueError(f"fastpath.json: trivial example {example!r} is a question or has a risk term")
+                self.words.update(tokens)
+                counts[label].update(_features(tokens))
+
+        # Laplace-smoothed log likelihoods, flattened so scoring is one dict lookup per feature
+        vocabulary = set().union(*counts.values())
+        total_examples = sum(len(examples) for examples in data["classes"].values())
+        self.priors = {}
+        self.unseen = {}
+        self.log_probs = {}
+        for label in self.labels:
+            denominator = sum(counts[label].values()) + len(vocabulary)
+            self.priors[label] = math.log(len(data["classes"][label]) / total_examples)
+            self.unseen[label] = math.log(1 / denominator)
+            for feature, count in counts[label].items():
+                self.log_probs[(label, feature)] = math.log((count + 1) / denominator)
+
+    def _risky(self, message, tokens):
+        # Questions and refusals ("are you ok", "yes?", "no thanks") always need a real read
+        return (not tokens or len(tokens) > self.max_tokens or "?" in message
+                or tokens[0] in self.question_words or any(t in self.risk_terms for t in tokens))
+
+    def classify(self, message):
+        tokens = tokenize(message)
+        sentiment, emotion = core.score_sentiment(message)
+        risky = self._risky(message, tokens)
+        if len(tokens) > self.max_tokens:
+            # Long messages are never trivial; skip scoring entirely
+            return Verdict(SUBSTANTIVE, 1.0, sentiment, emotion, risky)
+
+        features = _features(tokens)
+        scores = {}
+        for label in self.labels:
+            score = self.priors[label]
+            unseen = self.unseen[label]
+            for feature in features:
+                score += self.log_probs.get((label, feature), unseen)
+            scores[label] = score
+
+        # Confidence is trivial-vs-substantive mass, not just the winning class
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        weights = {label: math.exp(score - top) for label, score in scores.items()}
+        substantive = weights[SUBSTANTIVE] / sum(weights.values())
+        confidence = substantive if best == SUBSTANTIVE else 1 - substantive
+        # Numbers ("see you at 5") are as good as known words
+        known = sum(token in self.words or token.isdigit() for token in tokens) / max(1, len(tokens))
+        return Verdict(best, confidence, sentiment, emotion, risky, known)
+
+    def reply(self, verdict, action):
+        return f"⚡ **Quick read:** {self.replies[verdict.label][action]}"
+
+
+def _load():
+    with open(DATA_PATH, encoding="utf-8") as f:
+        return FastPathClassifier(json.load(f))
+
+
+classifier = _load()
+
+
+def try_local(message, action):
+    """Returns (local_answer, hint). Exactly one is set, or neither for clear model work."""
+    verdict = classifier.classify(message)
+    if verdict.trivial:
+        return classifier.reply(verdict, action), None
+    return None, verdict.hint
+
+
+def try_local_structured(msg, is_received=False):
+    """Gemini-app variant: returns (result_dict, hint) in the shape analyze() produces."""
+    verdict = classifier.classify(msg)
+    if not verdict.trivial:
+        return None, verdict.hint
+    if is_received:
+        return {
+            "sentiment": verdict.sentiment,
+            "emotion": verdict.emotion,
+            "meaning": classifier.reply(verdict, "analyze"),
+            "need": "Nothing beyond a brief, friendly reply",
+            "response": classifier.replies[verdict.label]["response"]
+        }, None
+    return {
+        "sentiment": verdict.sentiment,
+        "emotion": verdict.emotion,
+        "reframed": msg
+    }, None
@@ -0,0 +1,350 @@
+"""
+Third Voice - Concurrent-User Load Simulator
+Drives streamlit_app.py and 0streamlit_app.py headlessly with Streamlit's
+AppTest harness. Each virtual user runs in its own process (AppTest is not
+safe to run concurrently in one process) and, after an unmeasured warm-up,
+runs a scripted session: pick a context, paste, analyze, improve, open
+history. Both apps talk to a local fake provider with configurable latency
+instead of OpenRouter/Gemini.
+
+    python -m third_voice.loadtest --levels 1,2,4,8,16 --provider-latency 0.3
+
+Reports script-run latency per successful step, RSS growth per live session
+(summed over the user processes) and the saturation point: the first
+concurrency level where any step fails, throughput stops scaling or p95
+latency crosses --p95-limit.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_APPS = [os.path.join(ROOT, "streamlit_app.py"), os.path.join(ROOT, "0streamlit_app.py")]
+
+MESSAGES = [
+    "ok thanks",
+    "see you at 5",
+    "I feel like you never listen to me when I talk about work.",
+    "Can we talk about the holiday schedule for the kids? Last year was really hard on them.",
+    "Your report was late again and the client noticed. We need to fix this before Friday.",
+    "I'm sorry about last night. I was stressed and said things I didn't mean.",
+    "Mom keeps bringing up the wedding and I don't know how to tell her we're not ready.",
+]
+CONTEXTS = ["general", "romantic", "workplace", "family", "coparenting"]
+SETTLE_RUNS = 5  # Extra script runs allowed for a click's pending st.rerun() to finish
+
+
+# ===== Fake Provider =====
+class FakeProvider(BaseHTTPRequestHandler):
+    """Answers OpenRouter chat completions and Gemini generateContent after a fixed delay."""
+
+    latency = 0.3
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.latency)
+
+        if ":generateContent" in self.path:
+            text = json.dumps({
+                "sentiment": "neutral", "emotion": "concerned", "meaning": "They want to be heard.",
+                "need": "Reassurance", "response": "I hear you.", "reframed": "Could we talk about this?"
+            })
+            payload = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"},
+                                       "finishReason": "STOP", "index": 0}]}
+        else:
+            content = "They seem stressed and want acknowledgement.\nSUMMARY: A tense exchange about plans."
+            if body.get("stream"):
+                self._stream(content)
+                return
+            payload = {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+        encoded = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def _stream(self, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for word in content.split(" "):
+            chunk = {"choices": [{"delta": {"content": word + " "}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fake_provider(latency):
+    FakeProvider.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeProvider)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# ===== Virtual Users =====
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Peak rather than current RSS, but still shows growth (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class VirtualUser:
+    def __init__(self, app_path, seed, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.app_path = app_path
+        self.random = random.Random(seed)
+        self.at = AppTest.from_file(app_path, default_timeout=timeout)
+        self.at.secrets["OPENROUTER_API_KEY"] = "load-test"
+        self.at.secrets["GEMINI_API_KEY"] = "load-test"
+        self.timings = []  # (step, seconds), successful steps only
+        self.errors = []
+
+    def step(self, name, action):
+        # A failed step is usually fast; timing it would flatter the latency numbers
+        start = time.perf_counter()
+        try:
+            action()
+        except Exception as e:
+            self.errors.append(f"{name}: {e}")
+            return
+        if self.at.exception:
+            self.errors.append(f"{name}: {self.at.exception[0].value}")
+            return
+        self.timings.append((name, time.perf_counter() - start))
+
+    def submit(self, find_button, history_key):
+        """Click a request button, let the app's follow-up rerun finish and check a result was added."""
+        at = self.at
+        if find_button().disabled:
+            at.run()  # Buttons rendered while the last request ran stay disabled until the next rerun
+        before = len(at.session_state[history_key])
+        find_button().click().run()
+        for _ in range(SETTLE_RUNS):
+            if "processing" not in at.session_state or not at.session_state["processing"]:
+                break
+            at.run()
+        else:
+            raise RuntimeError("still processing after the request finished")
+        if len(at.session_state[history_key]) <= before:
+            raise RuntimeError("no result was produced")
+
+    def run_scenario(self):
+        if os.path.basename(self.app_path).startswith("0"):
+            self._gemini_scenario()
+        else:
+            self._openrouter_scenario()
+
+    def _openrouter_scenario(self):
+        at = self.at
+        context = self.random.choice(CONTEXTS)
+        message = self.random.choice(MESSAGES)
+        self.step("load", at.run)
+        self.step("select_context", lambda: at.button(key=f"context_{context}").click().run())
+        self.step("paste", lambda: at.text_area(key="message_input").input(message).run())
+        self.step("analyze", lambda: self.submit(lambda: at.button(key="analyze_btn_unique"), "message_history"))
+        self.step("improve", lambda: self.submit(lambda: at.button(key="improve_btn_unique"), "message_history"))
+        self.step("open_history", lambda: _button_by_label(at, "📤 Upload History").click().run())
+
+    def _gemini_scenario(self):
+        at = self.at
+        context = self.random.choice(CONTEXTS)
+        message = self.random.choice(MESSAGES)
+        self.step("load", at.run)
+        if at.text_input:
+            self.step("beta_token", lambda: at.text_input[0].input("ttv-beta-001").run())
+        self.step("select_context", lambda: at.selectbox(key="ctx").select(context).run())
+        self.step("paste", lambda: at.text_area(key="coach_msg").input(message).run())
+        self.step("improve", lambda: self.submit(lambda: _button_by_label(at, "🚀 Analyze"), "history"))
+        self.step("paste_received", lambda: at.text_area(key="translate_msg").input(message).run())
+        self.step("analyze", lambda: self.submit(lambda: _button_by_label(at, "🔍 Analyze"), "history"))
+        self.step("open_history", lambda: at.sidebar.button[-1].click().run())
+
+
+def _button_by_label(at, label):
+    for button in at.button:
+        if button.label == label:
+            return button
+    raise LookupError(f"No button labelled {label!r}")
+
+
+# ===== Load Levels =====
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _user_process(app_path, index, iterations, timeout, barrier, results):
+    """One virtual user per process: AppTest patches process-global Streamlit state, so
+    users sharing a process would break each other's runs."""
+    report = {'timings': [], 'errors': [], 'sessions': 0, 'rss_growth': 0}
+    sessions = []  # Kept alive until the end so RSS reflects live sessions
+    try:
+        # Unmeasured warm-up: imports and first-run caches are a one-time cost per process
+        try:
+            VirtualUser(app_path, seed=-1 - index, timeout=timeout).run_scenario()
+        finally:
+            barrier.wait(timeout + 60)
+        rss_before = rss_bytes()
+        for iteration in range(iterations):
+            user = VirtualUser(app_path, seed=index * 1000 + iteration, timeout=timeout)
+            user.run_scenario()
+            sessions.append(user)
+            report['timings'].extend(user.timings)
+            report['errors'].extend(user.errors)
+        report['rss_growth'] = rss_bytes() - rss_before
+    except Exception as e:
+        report['errors'].append(f"user {index}: {e!r}")
+    report['sessions'] = len(sessions)
+    results.put(report)
+
+
+def run_level(app_path, users, iterations, timeout):
+    """Run `users` concurrent virtual users, `iterations` scenarios each, keeping every session alive."""
+    context = multiprocessing.get_context("spawn")  # No forked copy of the fake provider's threads
+    barrier = context.Barrier(users + 1)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_user_process, args=(app_path, i, iterations, timeout, barrier, results), daemon=True)
+        for i in range(users)
+    ]
+    for process in processes:
+        process.start()
+
+    reports = []
+    try:
+        barrier.wait(timeout + 120)  # Every user warmed up; start the clock
+    except threading.BrokenBarrierError:
+        pass  # A user failed to start; the others still run and the gap shows up as errors
+    start = time.perf_counter()
+    deadline = start + timeout * (iterations * 8 + 1)
+    for _ in processes:
+        try:
+            reports.append(results.get(timeout=max(0.1, deadline - time.perf_counter())))
+        except queue.Empty:
+            break
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
+
+    timings = [timing for report in reports for timing in report['timings']]
+    latencies = [seconds for _, seconds in timings]
+    by_step = {}
+    for name, seconds in timings:
+        by_step.setdefault(name, []).append(seconds)
+    errors = [error for report in reports for error in report['errors']]
+    errors += [f"user process lost ({users - len(reports)} of {users})"] if len(reports) < users else []
+    sessions = sum(report['sessions'] for report in reports)
+
+    return {
+        'users': users,
+        'sessions': sessions,
+        'elapsed_s': round(elapsed, 2),
+        'runs_per_s': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'max_ms': round(max(latencies, default=0) * 1000, 1),
+        'rss_per_session_kb': round(sum(report['rss_growth'] for report in reports) / max(1, sessions) / 1024, 1),
+        'steps': {name: {'p50_ms': round(statistics.median(values) * 1000, 1),
+                         'p95_ms': round(percentile(values, 95) * 1000, 1)}
+                  for name, values in by_step.items()},
+        'errors': len(errors),
+        'first_errors': errors[:3]
+    }
+
+
+def find_saturation(levels, p95_limit_ms, min_gain=0.1):
+    """First level with errors, throughput gaining less than `min_gain`, or p95 over the limit."""
+    previous = None
+    for level in levels:
+        if level['errors'] or not level['sessions']:
+            return level['users'], f"{level['errors']} errors in {level['sessions']} sessions"
+        if level['p95_ms'] > p95_limit_ms:
+            return level['users'], f"p95 {level['p95_ms']}ms > {p95_limit_ms}ms"
+        if previous and level['runs_per_s'] < previous['runs_per_s'] * (1 + min_gain):
+            return level['users'], f"throughput flat ({previous['runs_per_s']} -> {level['runs_per_s']} runs/s)"
+        previous = level
+    return None, "not reached"
+
+
+def print_report(app_path, levels, saturation):
+    print(f"\n== {os.path.basename(app_path)} ==")
+    print(f"{'users':>6} {'sessions':>9} {'runs/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'KB/session':>11} {'errors':>7}")
+    for level in levels:
+        print(f"{level['users']:>6} {level['sessions']:>9} {level['runs_per_s']:>8} {level['p50_ms']:>8} "
+              f"{level['p95_ms']:>8} {level['max_ms']:>8} {level['rss_per_session_kb']:>11} {level['errors']:>7}")
+        for error in level['first_errors']:
+            print(f"{'':>8}! {error}")
+    users, reason = saturation
+    print(f"Saturation: {users} users ({reason})" if users else f"Saturation: {reason}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless concurrent-user load test for the Third Voice apps")
+    parser.add_argument("--app", action="append", help="App script to drive (repeatable; default: both apps)")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="Comma-separated concurrent user counts")
+    parser.add_argument("--iterations", type=int, default=2, help="Scenarios per virtual user per level")
+    parser.add_argument("--provider-latency", type=float, default=0.3, help="Fake provider delay in seconds")
+    parser.add_argument("--p95-limit", type=float, default=2.0, help="p95 script-run latency (s) that counts as saturated")
+    parser.add_argument("--timeout", type=float, default=60, help="Per script-run timeout in seconds")
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args(argv)
+
+    server, url = start_fake_provider(args.provider_latency)
+    # Must be set before the apps import third_voice.core
+    os.environ["OPENROUTER_API_URL"] = f"{url}/api/v1/chat/completions"
+    os.environ["GEMINI_API_ENDPOINT"] = url
+    os.environ.setdefault("THIRD_VOICE_SNAPSHOT_DB", os.path.join(tempfile.mkdtemp(), "snapshots.sqlite3"))
+
+    levels = [int(value) for value in args.levels.split(",") if value.strip()]
+    report = {'provider_latency_s': args.provider_latency, 'apps': {}}
+    try:
+        for app_path in [os.path.abspath(path) for path in args.app] if args.app else DEFAULT_APPS:
+            results = [run_level(app_path, users, args.iterations, args.timeout) for users in levels]
+            saturation = find_saturation(results, args.p95_limit * 1000)
+            print_report(app_path, results, saturation)
+            report['apps'][os.path.basename(app_path)] = {
+                'levels': results,
+                'saturation_users': saturation[0],
+                'saturation_reason': saturation[1]
+            }
+    finally:
+        server.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Third Voice - Rerun Profiler
+Opt-in section timers for Streamlit reruns, aggregated across runs, with
+optional cProfile capture and on-disk dumps for offline analysis.
+
+Enable with THIRD_VOICE_PROFILE=1 (timers) or THIRD_VOICE_PROFILE=cprofile
+(timers + cProfile). The same values in a ?profile= query parameter are only
+honoured when THIRD_VOICE_PROFILE_ALLOW_QUERY=1. Dumps go to
+THIRD_VOICE_PROFILE_DIR (default: profiles/); only the newest
+MAX_PROFILE_DUMPS .prof files are kept.
+"""
+
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+MODES = ("timers", "cprofile")
+DEFAULT_DUMP_DIR = "profiles"
+MAX_PROFILE_DUMPS = 20  # .prof files kept on disk, oldest removed first
+
+_active = threading.local()  # Profiler for the rerun running on this thread
+
+
+def parse_mode(*values):
+    """First truthy setting wins; returns 'timers', 'cprofile' or None."""
+    for value in values:
+        value = (value or "").strip().lower()
+        if value in ("1", "true", "on", "yes", "timers"):
+            return "timers"
+        if value == "cprofile":
+            return "cprofile"
+    return None
+
+
+def section(name):
+    """Time a block against the profiler of the current rerun, if any."""
+    profiler = getattr(_active, "profiler", None)
+    if profiler is None:
+        return nullcontext()
+    return profiler.section(name)
+
+
+class Profiler:
+    def __init__(self, mode="timers", dump_dir=DEFAULT_DUMP_DIR):
+        self.mode = mode
+        self.dump_dir = dump_dir
+        self.lock = threading.Lock()
+        self.runs = 0
+        self.stats = {}  # name -> {'calls', 'total', 'max', 'last'}
+
+    def _record(self, name, elapsed):
+        with self.lock:
+            entry = self.stats.setdefault(name, {'calls': 0, 'total': 0.0, 'max': 0.0, 'last': 0.0})
+            entry['calls'] += 1
+            entry['total'] += elapsed
+            entry['last'] = elapsed
+            if elapsed > entry['max']:
+                entry['max'] = elapsed
+
+    @contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - start)
+
+    @contextmanager
+    def run(self, name="main"):
+        """Wrap one full script execution. Streamlit's rerun/stop exceptions still get recorded."""
+        profile = None
+        if self.mode == "cprofile":
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                profile = None  # Another session's profile is active (3.12+ allows only one)
+        _active.profiler = self
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - start
+            _active.profiler = None
+            if profile is not None:
+                profile.disable()
+            with self.lock:
+                self.runs += 1
+                run_number = self.runs
+            self._record(name, elapsed)
+            self.dump(run_number, profile)
+
+    def slowest(self, limit=10):
+        with self.lock:
+            rows = [
+                {
+                    'section': name,
+                    'calls': entry['calls'],
+                    'mean_ms': round(entry['total'] / entry['calls'] * 1000, 2),
+                    'max_ms': round(entry['max'] * 1000, 2),
+                    'last_ms': round(entry['last'] * 1000, 2),
+                    'total_ms': round(entry['total'] * 1000, 1)
+                }
+                for name, entry in self.stats.items()
+            ]
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        return rows[:limit]
+
+    def dump(self, run_number, profile=None):
+        try:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            if profile is not None:
+                stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                profile.dump_stats(os.path.join(self.dump_dir, f"run_{stamp}_{run_number}.prof"))
+                self._rotate()
+            summary = {
+                'updated': datetime.now().isoformat(),
+                'runs': run_number,
+                'mode': self.mode,
+                'sections': self.slowest(limit=None)
+            }
+            tmp_path = os.path.join(self.dump_dir, f"sections.json.{threading.get_ident()}")
+            with open(tmp_path, "w") as f:
+                json.dump(summary, f, indent=2)
+            os.replace(tmp_path, os.path.join(self.dump_dir, "sections.json"))
+        except OSError:
+            pass  # Profiling must never break the app (e.g. read-only deploy)
+
+    def _rotate(self):
+        dumps = [entry for entry in os.scandir(self.dump_dir) if entry.name.endswith(".prof")]
+        dumps.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in dumps[:-MAX_PROFILE_DUMPS]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass  # Another session rotated it first
+
+    def reset(self):
+        with self.lock:
+            self.runs = 0
+            self.stats.clear()
+
+
+def render_panel(st, profiler, limit=10, extra=None):
+    """Developer-only table of the slowest sections; pass the streamlit module.
+    `extra` maps a title to more rows to show, e.g. prompt A/B stats."""
+    with st.expander(f"🛠️ Profiler ({profiler.runs} runs, {profiler.mode})", expanded=False):
+        rows = profiler.slowest(limit)
+        if rows:
+            st.table(rows)
+        for title, extra_rows in (extra or {}).items():
+            if extra_rows:
+                st.markdown(f"**{title}**")
+                st.table(extra_rows)
+        if st.button("Reset profiler", key="profiler_reset"):
+            profiler.reset()
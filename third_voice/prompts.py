@@ -0,0 +1,229 @@
+"""
+Third Voice - Prompt Registry
+Versioned prompt templates per (action, context), loaded from the bundled
+data/prompts.json and validated once at import. Each template is split into
+a static prefix (system prompt + user text before the message) and the
+variable message, so identical prefixes reach the provider and its prompt
+cache can apply. Token counts for the static parts are precomputed.
+
+A/B tests assign a version per request from the "experiments" weights in
+prompts.json, or THIRD_VOICE_PROMPT_EXPERIMENTS='{"analyze": {"v2": 0.5}}'.
+Latency and response length are recorded per version.
+
+    python -m third_voice.prompts             # registry summary with token counts
+    python -m third_voice.prompts --ab analyze --messages samples.txt
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import string
+import threading
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "prompts.json")
+WILDCARD = "*"
+SYSTEM_PLACEHOLDERS = {"context", "context_title"}
+PLACEHOLDERS = SYSTEM_PLACEHOLDERS | {"message"}  # User templates only
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class PromptRegistryError(ValueError):
+    """prompts.json is missing a template or uses an unknown placeholder."""
+
+
+def estimate_tokens(text):
+    # Word pieces plus punctuation, scaled for sub-word splits; close enough to budget prompts
+    return round(len(_TOKEN_RE.findall(text)) * 1.3)
+
+
+class Template:
+    def __init__(self, action, context, version, system, user):
+        self.action = action
+        self.context = context
+        self.version = version
+        fields = {"context": context, "context_title": context.capitalize()}
+        self.system = system.format(**fields)
+        # Everything before {message} is static per (action, context, version)
+        before, after = user.split("{message}")
+        self.user_prefix = before.format(**fields)
+        self.user_suffix = after.format(**fields)
+        self.static_tokens = estimate_tokens(self.system) + estimate_tokens(self.user_prefix + self.user_suffix)
+
+    def render_user(self, message, hint=None):
+        # Plain concatenation: braces in the user's message are never interpreted
+        text = self.user_prefix + message + self.user_suffix
+        if hint:
+            text += f"\nLocal pre-analysis: {hint}"
+        return text
+
+    def render(self, message, hint=None):
+        """Single-string form for providers without a system role."""
+        return f"{self.system}\n\n{self.render_user(message, hint)}"
+
+
+class PromptRegistry:
+    def __init__(self, data, experiments=None):
+        self.contexts = data["contexts"]
+        self.active = {}
+        self.templates = {}  # (action, context, version) -> Template
+        self.experiments = experiments if experiments is not None else data.get("experiments", {})
+        self.lock = threading.Lock()
+        self.stats = {}  # (action, version) -> {'calls', 'latency', 'chars'}
+        self._compile(data["actions"])
+        self._validate_experiments()
+
+    def _compile(self, actions):
+        for action, spec in actions.items():
+            user = spec["user"]
+            self._check_placeholders(action, user, PLACEHOLDERS)
+            if user.count("{message}") != 1:
+                raise PromptRegistryError(f"{action}: user template must contain {{message}} exactly once")
+            self.active[action] = spec["active"]
+            if spec["active"] not in spec["versions"]:
+                raise PromptRegistryError(f"{action}: active version {spec['active']!r} is not defined")
+
+            for version, systems in spec["versions"].items():
+                for context in systems:
+                    if context != WILDCARD and context not in self.contexts:
+                        raise PromptRegistryError(f"{action}/{version}: unknown context {context!r}")
+                for context in self.contexts:
+                    system = systems.get(context, systems.get(WILDCARD))
+                    if system is None:
+                        if version == spec["active"]:
+                            raise PromptRegistryError(f"{action}/{version}: no prompt for context {context!r}")
+                        continue  # Non-active versions may cover only some contexts
+                    self._check_placeholders(f"{action}/{version}/{context}", system, SYSTEM_PLACEHOLDERS)
+                    self.templates[(action, context, version)] = Template(action, context, version, system, user)
+
+    def _check_placeholders(self, where, text, allowed):
+        try:
+            names = {name for _, name, _, _ in string.Formatter().parse(text) if name is not None}
+        except ValueError as e:
+            raise PromptRegistryError(f"{where}: {e}")
+        unknown = names - allowed
+        if unknown:
+            raise PromptRegistryError(f"{where}: unknown placeholders {sorted(unknown)}")
+
+    def _validate_experiments(self):
+        for action, weights in self.experiments.items():
+            if action not in self.active:
+                raise PromptRegistryError(f"experiment for unknown action {action!r}")
+            if any(weight < 0 for weight in weights.values()):
+                raise PromptRegistryError(f"{action}: experiment weights must not be negative")
+            if sum(weights.values()) > 1:
+                raise PromptRegistryError(f"{action}: experiment weights exceed 1")
+            for version in weights:
+                if not any(key[0] == action and key[2] == version for key in self.templates):
+                    raise PromptRegistryError(f"{action}: experiment version {version!r} is not defined")
+
+    # ===== Lookup =====
+    def get(self, action, context, version=None):
+        """Template for (action, context); unknown contexts fall back to 'general'."""
+        if context not in self.contexts:
+            context = "general"
+        version = version or self.active[action]
+        template = self.templates.get((action, context, version))
+        return template or self.templates[(action, context, self.active[action])]
+
+    def select(self, action, context, unit=""):
+        """Pick a version for A/B tests; the same unit (message, session) always lands in the same bucket."""
+        weights = self.experiments.get(action)
+        if not weights:
+            return self.get(action, context)
+        digest = hashlib.sha256(f"{action}\x1f{unit}".encode()).digest()
+        point = int.from_bytes(digest[:8], "big") / 2 ** 64
+        for version, weight in weights.items():
+            if point < weight:
+                return self.get(action, context, version)
+            point -= weight
+        return self.get(action, context)
+
+    # ===== A/B Stats =====
+    def record(self, template, latency, chars):
+        key = (template.action, template.version)
+        with self.lock:
+            entry = self.stats.setdefault(key, {'calls': 0, 'latency': 0.0, 'chars': 0})
+            entry['calls'] += 1
+            entry['latency'] += latency
+            entry['chars'] += chars
+
+    def ab_report(self):
+        with self.lock:
+            return [
+                {
+                    'action': action,
+                    'version': version,
+                    'calls': entry['calls'],
+                    'mean_latency_ms': round(entry['latency'] / entry['calls'] * 1000, 1),
+                    'mean_chars': round(entry['chars'] / entry['calls'])
+                }
+                for (action, version), entry in sorted(self.stats.items())
+            ]
+
+
+def load(path=DATA_PATH):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    override = os.environ.get("THIRD_VOICE_PROMPT_EXPERIMENTS")
+    return PromptRegistry(data, json.loads(override) if override else None)
+
+
+registry = load()
+
+
+# ===== CLI =====
+# Under `python -m` this file runs as __main__, a second copy of the module;
+# core records A/B stats on the imported third_voice.prompts registry, so the
+# CLI reads and reports through that one.
+def _summary(registry):
+    print(f"{'action':<15} {'version':<8} {'context':<12} {'static tokens':>13}  active")
+    for (action, context, version), template in sorted(registry.templates.items()):
+        marker = "*" if registry.active[action] == version else ""
+        print(f"{action:<15} {version:<8} {context:<12} {template.static_tokens:>13}  {marker}")
+
+
+def _ab_test(registry, action, context, messages, rounds):
+    from third_voice import core
+
+    api_key = os.environ.get("OPENROUTER_API_KEY")
+    if not api_key:
+        raise SystemExit("OPENROUTER_API_KEY is not set")
+    versions = sorted({version for (a, c, version) in registry.templates if a == action and c == context})
+    for _ in range(rounds):
+        for message in messages:
+            for version in versions:
+                template = registry.get(action, context, version)
+                result, error = core.call_openrouter(message, action, context, api_key, template=template)
+                if error:
+                    print(f"{version}: {error}")
+    for row in registry.ab_report():
+        print(row)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the prompt registry or A/B test template versions")
+    parser.add_argument("--ab", metavar="ACTION", help="Run every version of ACTION against the provider")
+    parser.add_argument("--context", default="general")
+    parser.add_argument("--messages", help="File with one sample message per line")
+    parser.add_argument("--rounds", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    from third_voice.prompts import registry
+    if not args.ab:
+        _summary(registry)
+        return
+    if args.ab not in registry.active:
+        parser.error(f"unknown action {args.ab!r}")
+    if args.messages:
+        with open(args.messages, encoding="utf-8") as f:
+            messages = [line.strip() for line in f if line.strip()]
+    else:
+        messages = ["I feel like you never listen to me.", "Can we move the meeting? I'm swamped this week."]
+    _ab_test(registry, args.ab, args.context, messages, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Third Voice - HTTP Inference Service
+Standard-library asyncio server exposing the inference core to mobile
+clients, independent of Streamlit's rerun model.
+
+    OPENROUTER_API_KEY=... python -m third_voice.server --port 8080
+
+Endpoints:
+    GET  /health
+    POST /v1/analyze   {"message": "...", "context": "general", "stream": false}
+    POST /v1/improve   (same body)
+
+With "stream": true the reply is text/event-stream, one `data: {"delta": ...}`
+event per chunk and a final `data: [DONE]`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from third_voice import core, fastpath, prompts
+
+MAX_BODY_BYTES = 64 * 1024
+HEADER_TIMEOUT = 10  # Seconds to receive request line + headers
+KEEPALIVE_TIMEOUT = 30
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class InferenceService:
+    def __init__(self, api_key, auth_token=None, max_inflight=64):
+        self.api_key = api_key
+        self.auth_token = auth_token
+        # Provider calls are blocking; they run on a dedicated pool sized to the
+        # in-flight limit so the event loop keeps accepting connections.
+        self.executor = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="inference")
+        self.inflight = asyncio.Semaphore(max_inflight)
+        # Pooled HTTPS connections to the provider; requests.Session is safe
+        # enough for concurrent posts with independent bodies.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_inflight)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # ===== Connection Handling =====
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEPALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    keep_alive = await self.dispatch(writer, method, path, headers, body, keep_alive)
+                except HTTPError as e:
+                    await send_json(writer, e.status, {"error": e.message}, keep_alive)
+                if not keep_alive:
+                    break
+        except HTTPError as e:
+            await send_json(writer, e.status, {"error": e.message}, False)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def dispatch(self, writer, method, path, headers, body, keep_alive=True):
+        """Route one request. Returns False when the connection must be closed."""
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET")
+            await send_json(writer, HTTPStatus.OK, {"status": "ok"}, keep_alive)
+            return keep_alive
+
+        action = {"/v1/analyze": "analyze", "/v1/improve": "improve"}.get(path)
+        if action is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown endpoint")
+        if method != "POST":
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST")
+        if self.auth_token and headers.get("authorization") != f"Bearer {self.auth_token}":
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "Invalid token")
+
+        message, context, stream = parse_body(body)
+        local, hint = fastpath.try_local(message, action)
+        if stream:
+            await self.stream(writer, message, action, context, local, hint)
+            return False  # Streamed responses are close-delimited
+
+        if local:
+            result, error = local, None
+        else:
+            async with self.inflight:
+                loop = asyncio.get_running_loop()
+                result, error = await loop.run_in_executor(
+                    self.executor,
+                    partial(core.call_openrouter, message, action, context, self.api_key, self.session, hint=hint)
+                )
+        if error:
+            await send_json(writer, HTTPStatus.BAD_GATEWAY, {"error": error}, keep_alive)
+        else:
+            await send_json(writer, HTTPStatus.OK, {"result": result, "action": action, "context": context}, keep_alive)
+        return keep_alive
+
+    async def stream(self, writer, message, action, context, local=None, hint=None):
+        loop = asyncio.get_running_loop()
+        async with self.inflight:
+            if local:
+                chunks = iter([local])
+            else:
+                chunks = core.stream_openrouter(message, action, context, self.api_key, self.session, hint=hint)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/event-stream; charset=utf-8\r\n"
+                b"Cache-Control: no-cache\r\n"
+                b"Connection: close\r\n\r\n"
+            )
+            try:
+                while True:
+                    # Pull the next chunk off the blocking iterator without stalling the loop
+                    delta = await loop.run_in_executor(self.executor, next, chunks, None)
+                    if delta is None:
+                        break
+                    writer.write(sse({"delta": delta}))
+                    await writer.drain()
+            except core.ProviderError as e:
+                writer.write(sse({"error": str(e)}))
+            finally:
+                if hasattr(chunks, "close"):
+                    chunks.close()
+            writer.write(b"data: [DONE]\n\n")
+            await writer.drain()
+
+
+# ===== HTTP Helpers =====
+async def read_request(reader):
+    # readline() raises ValueError once a line outgrows the stream's buffer limit
+    try:
+        request_line = await reader.readline()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Request line too long")
+    if not request_line:
+        return None
+    try:
+        method, target, _version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+    headers = {}
+    while True:
+        try:
+            line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+        except ValueError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Header line too long")
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+def parse_body(body):
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be JSON")
+    if not isinstance(data, dict):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+
+    message = data.get("message")
+    if not isinstance(message, str) or not message.strip():
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "'message' is required")
+    context = data.get("context", "general")
+    if not isinstance(context, str) or context not in prompts.registry.contexts:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"'context' must be one of: {', '.join(prompts.registry.contexts)}")
+    stream = data.get("stream", False)
+    if not isinstance(stream, bool):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "'stream' must be true or false")
+    return message, context, stream
+
+
+async def send_json(writer, status, payload, keep_alive=True):
+    status = HTTPStatus(status)
+    body = json.dumps(payload, ensure_ascii=False).encode()
+    writer.write(
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+
+
+def sse(payload):
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode()
+
+
+# ===== Entry Point =====
+async def serve(host, port, service):
+    server = await asyncio.start_server(service.handle_connection, host, port, limit=MAX_BODY_BYTES)
+    addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+    print(f"Third Voice inference service listening on {addresses}")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Third Voice HTTP inference service")
+    parser.add_argument("--host", default=os.environ.get("THIRD_VOICE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("THIRD_VOICE_PORT", "8080")))
+    parser.add_argument("--max-inflight", type=int, default=64,
+                        help="Concurrent provider calls per process")
+    args = parser.parse_args(argv)
+
+    api_key = os.environ.get("OPENROUTER_API_KEY")
+    if not api_key:
+        parser.error("OPENROUTER_API_KEY is not set")
+
+    async def run():
+        service = InferenceService(api_key, os.environ.get("THIRD_VOICE_SERVICE_TOKEN"), args.max_inflight)
+        await serve(args.host, args.port, service)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Third Voice - Session Snapshots
+SQLite-backed store that survives browser refreshes and mobile tab
+eviction. Session state is saved under a random token carried in the URL,
+and finished background jobs are recorded so a reload can pick up a result
+instead of paying for the same request again.
+"""
+
+import hashlib
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = ".third_voice_snapshots.sqlite3"
+SNAPSHOT_TTL = 24 * 60 * 60  # Seconds a session survives without activity
+JOB_TTL = 60 * 60
+MAX_SNAPSHOT_BYTES = 256 * 1024  # Per session, after JSON encoding
+CLEANUP_EVERY = 100  # Saves between expiry sweeps
+TOUCH_INTERVAL = 60  # Seconds between refreshing the timestamp of an unchanged snapshot
+
+_TOKEN_RE = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+def new_token():
+    return secrets.token_urlsafe(16)
+
+
+def valid_token(token):
+    return bool(token) and bool(_TOKEN_RE.match(token))
+
+
+# Collections that may lose their oldest entries when a snapshot is too big,
+# as key paths: lists are newest-first, dicts oldest-first (insertion order)
+TRIMMABLE = [('message_history',), ('result_cache',), ('thread_state', 'results')]
+
+
+def _lookup(data, path):
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+def _trim(data, path):
+    """Halve the collection at `path`, copying dicts on the way so live session state is untouched."""
+    *parents, key = path
+    for name in parents:
+        data[name] = dict(data[name])
+        data = data[name]
+    value = data[key]
+    if isinstance(value, list):
+        data[key] = value[:len(value) // 2]
+    else:
+        keys = list(value)
+        data[key] = {k: value[k] for k in keys[len(keys) - len(keys) // 2:]}
+
+
+def shrink(data, max_bytes, trimmable=TRIMMABLE):
+    """
+    Drop the oldest entries of the largest trimmable collection until the
+    encoded snapshot fits. Other fields are structured state and are never
+    cut in half: once nothing is left to trim, the largest is dropped whole
+    and restores from its default.
+    """
+    encoded = json.dumps(data, ensure_ascii=False)
+    while len(encoded.encode()) > max_bytes and data:
+        sizes = {}
+        for path in trimmable:
+            value = _lookup(data, path)
+            if isinstance(value, (list, dict)) and value:
+                sizes[path] = len(json.dumps(value, ensure_ascii=False))
+        if sizes:
+            _trim(data, max(sizes, key=sizes.get))
+        else:
+            sizes = {key: len(json.dumps(value, ensure_ascii=False)) for key, value in data.items()}
+            del data[max(sizes, key=sizes.get)]
+        encoded = json.dumps(data, ensure_ascii=False)
+    return encoded
+
+
+class SnapshotStore:
+    def __init__(self, path=DEFAULT_PATH, ttl=SNAPSHOT_TTL, max_bytes=MAX_SNAPSHOT_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.saves = 0
+        self.digests = {}  # token -> digest of the last saved payload, to skip no-op writes
+        self.touched = {}  # token -> when its row's timestamp was last written
+        # One shared connection guarded by a lock; Streamlit runs sessions on separate threads
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots (token TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, token TEXT NOT NULL, "
+                "result TEXT, error TEXT, updated REAL NOT NULL)"
+            )
+        self.cleanup()
+
+    # ===== Session Snapshots =====
+    def save(self, token, data):
+        encoded = shrink(dict(data), self.max_bytes)
+        digest = hashlib.sha1(encoded.encode()).hexdigest()
+        now = time.time()
+        with self.lock:
+            if self.digests.get(token) == digest:
+                # Unchanged but still in use: keep it from expiring without rewriting the payload
+                if now - self.touched.get(token, 0) < TOUCH_INTERVAL:
+                    return
+                cursor = self.conn.execute("UPDATE snapshots SET updated = ? WHERE token = ?", (now, token))
+                if cursor.rowcount:
+                    self.touched[token] = now
+                    return
+            self.conn.execute(
+                "INSERT OR REPLACE INTO snapshots (token, data, updated) VALUES (?, ?, ?)",
+                (token, encoded, now)
+            )
+            self.digests[token] = digest
+            self.touched[token] = now
+            self.saves += 1
+            sweep = self.saves % CLEANUP_EVERY == 0
+        if sweep:
+            self.cleanup()
+
+    def load(self, token):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT data, updated FROM snapshots WHERE token = ?", (token,)
+            ).fetchone()
+        if row is None or row[1] < time.time() - self.ttl:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    # ===== Background Jobs =====
+    def save_job(self, job_id, token, result, error):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, token, result, error, updated) VALUES (?, ?, ?, ?, ?)",
+                (job_id, token, result, error, time.time())
+            )
+
+    def load_job(self, job_id, token):
+        """Returns (result, error) for a finished job, or None if unknown or expired."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT result, error, updated FROM jobs WHERE job_id = ? AND token = ?", (job_id, token)
+            ).fetchone()
+        if row is None or row[2] < time.time() - JOB_TTL:
+            return None
+        return row[0], row[1]
+
+    def cleanup(self):
+        now = time.time()
+        with self.lock:
+            expired = [row[0] for row in self.conn.execute(
+                "SELECT token FROM snapshots WHERE updated < ?", (now - self.ttl,)
+            )]
+            self.conn.execute("DELETE FROM snapshots WHERE updated < ?", (now - self.ttl,))
+            self.conn.execute("DELETE FROM jobs WHERE updated < ?", (now - JOB_TTL,))
+            for token in expired:
+                self.digests.pop(token, None)
+                self.touched.pop(token, None)
+
+
+def open_store():
+    return SnapshotStore(
+        os.environ.get("THIRD_VOICE_SNAPSHOT_DB", DEFAULT_PATH),
+        ttl=int(os.environ.get("THIRD_VOICE_SNAPSHOT_TTL", SNAPSHOT_TTL)),
+        max_bytes=int(os.environ.get("THIRD_VOICE_SNAPSHOT_MAX_BYTES", MAX_SNAPSHOT_BYTES))
+    )
@@ -0,0 +1,171 @@
+"""
+Third Voice - Incremental Thread Analysis
+Parses pasted chat logs into turns and analyzes only the turns not seen
+before, carrying a rolling summary of everything older. Prompt size stays
+roughly constant however long the conversation grows.
+"""
+
+import hashlib
+import re
+from collections import Counter
+
+from third_voice import core, prompts
+
+RECENT_TURNS = 8  # New turns sent verbatim; older unseen turns are folded into the summary
+TURN_MAX_CHARS = 600
+SUMMARY_MAX_CHARS = 800
+CACHE_SIZE = 200  # Cached (turn, action, context) results per thread state
+
+# "12/01/2024, 10:32 - Alice: hi", "[12/01/24, 10:32:11] Alice: hi", "[10:32] Alice: hi", "Alice: hi"
+_TURN_RE = re.compile(
+    r"^\s*(?:\[[^\]]{1,30}\]\s*|\d{1,4}[./-]\d{1,2}[./-]\d{1,4},?\s+\d{1,2}:\d{2}(?::\d{2})?\s*(?:[AaPp][Mm])?\s*-\s*)?"
+    r"(?P<speaker>[^:\n\[\]]{1,30}?):\s+(?P<text>.*)$"
+)
+_SUMMARY_RE = re.compile(r"^\s*SUMMARY:\s*")
+
+# Registry actions whose system prompts carry the task and the SUMMARY directive
+THREAD_ACTIONS = {'analyze': "thread_analyze", 'improve': "thread_improve"}
+
+
+class Turn:
+    def __init__(self, speaker, text):
+        self.speaker = speaker
+        self.text = text
+
+    def render(self):
+        return f"{self.speaker}: {_clip(self.text, TURN_MAX_CHARS)}"
+
+
+def parse_turns(text):
+    """Split a pasted chat into turns. Lines without a 'Name:' prefix continue the previous turn."""
+    turns = []
+    for line in text.splitlines():
+        match = _TURN_RE.match(line)
+        if match:
+            turns.append(Turn(match.group("speaker").strip(), match.group("text").strip()))
+        elif line.strip() and turns:
+            turns[-1].text += "\n" + line.strip()
+        elif line.strip():
+            turns.append(Turn("Unknown", line.strip()))
+    return turns
+
+
+def is_thread(text):
+    turns = parse_turns(text)
+    return len(turns) >= 2 and len({turn.speaker for turn in turns}) >= 2
+
+
+def turn_keys(turns):
+    """Chained content hashes, so an identical 'ok' at two points gets two keys."""
+    keys = []
+    previous = ""
+    for turn in turns:
+        previous = hashlib.sha256(f"{previous}\x1f{turn.speaker}\x1f{turn.text}".encode()).hexdigest()[:20]
+        keys.append(previous)
+    return keys
+
+
+def new_thread_state():
+    return {
+        'summary': "",  # Rolling summary of every turn in 'seen'
+        'seen': [],  # Keys of turns already folded into the summary, in order
+        'results': {}  # "key:action:context" -> result text
+    }
+
+
+def build_conversation(summary, new_turns):
+    """The variable part of a thread request; instructions live in the thread templates."""
+    parts = []
+    if summary:
+        parts.append(f"Conversation so far (summary): {summary}")
+    parts.append("New turns:\n" + "\n".join(turn.render() for turn in new_turns))
+    return "\n\n".join(parts)
+
+
+def split_summary(reply):
+    """
+    Separate the model's answer from its trailing 'SUMMARY:' line; summary is None if missing.
+    Only the final paragraph counts, so headings like "**Summary of needs**:" stay in the answer.
+    """
+    lines = reply.rstrip().splitlines()
+    for index in range(len(lines) - 1, -1, -1):
+        if not lines[index].strip():
+            break
+        match = _SUMMARY_RE.match(lines[index])
+        if match:
+            summary = "\n".join([lines[index][match.end():]] + lines[index + 1:]).strip()
+            return "\n".join(lines[:index]).strip(), summary or None
+    return reply.strip(), None
+
+
+def fold_turns(summary, turns):
+    """Cheap local summary update for turns the model never sees verbatim."""
+    if not turns:
+        return summary
+    speakers = ", ".join(dict.fromkeys(turn.speaker for turn in turns))
+    mood = Counter(core.score_sentiment(turn.text)[0] for turn in turns).most_common(1)[0][0]
+    recent = " / ".join(f"{turn.speaker}: {_clip(turn.text, 80)}" for turn in turns[-3:])
+    folded = f"{summary} Earlier, {len(turns)} turns between {speakers}, mostly {mood}; ending with: {recent}".strip()
+    return _clip_left(folded, SUMMARY_MAX_CHARS)
+
+
+def analyze_thread(text, action, context, state, api_key):
+    """
+    Analyze only unseen turns of a pasted thread.
+
+    `state` comes from new_thread_state() and is updated in place. The request
+    goes straight to the provider with the thread template for `action`: no
+    fast path, and no A/B bucketing on the ever-changing conversation text.
+    Returns (result, error, stats) where stats reports how many turns were new.
+    """
+    turns = parse_turns(text)
+    keys = turn_keys(turns)
+    stats = {'turns': len(turns), 'new': 0, 'cached': False}
+    if not turns:
+        return None, "No conversation turns found.", stats
+
+    cached = state['results'].get(f"{keys[-1]}:{action}:{context}")
+    if cached:
+        stats['cached'] = True
+        return cached, None, stats
+
+    # The thread must extend what we've seen; an edited history starts over
+    seen = state['seen']
+    if keys[:len(seen)] != seen:
+        state.update(new_thread_state())
+        seen = state['seen']
+
+    start = len(seen)
+    if start == len(turns):
+        # Everything is folded into the summary already; re-ask about the last turns only
+        start = max(0, len(turns) - 1)
+    fresh = turns[start:]
+    stats['new'] = len(turns) - len(seen)
+
+    older, recent = fresh[:-RECENT_TURNS], fresh[-RECENT_TURNS:]
+    summary = fold_turns(state['summary'], older)
+
+    template = prompts.registry.get(THREAD_ACTIONS.get(action, THREAD_ACTIONS['analyze']), context)
+    reply, error = core.call_openrouter(
+        build_conversation(summary, recent), template.action, context, api_key, template=template
+    )
+    if error:
+        return None, error, stats
+
+    result, model_summary = split_summary(reply)
+    state['summary'] = _clip_left(model_summary, SUMMARY_MAX_CHARS) if model_summary else fold_turns(summary, recent)
+    state['seen'] = keys
+    results = state['results']
+    results[f"{keys[-1]}:{action}:{context}"] = result
+    while len(results) > CACHE_SIZE:
+        results.pop(next(iter(results)))
+    return result, None, stats
+
+
+def _clip(text, limit):
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _clip_left(text, limit):
+    # Keep the most recent end of a rolling summary
+    return text if len(text) <= limit else "..." + text[-(limit - 3):]